@@ -34,10 +34,12 @@ from bottle_utils import html as helpers
 from bottle_utils.i18n import I18NPlugin, lazy_gettext as _, i18n_url
 from bottle_utils.common import to_unicode
 
+from librarian.core.archive import Archive
 from librarian.core.metadata import LICENSES
 from librarian.core.downloads import get_zipballs
 
 from librarian.lib import auth
+from librarian.lib import gspawn
 from librarian.lib import sessions
 from librarian.lib import squery
 from librarian.lib.lock import lock_plugin
@@ -73,6 +75,7 @@ from librarian import __version__
 
 MODDIR = dirname(abspath(__file__))
 APP_ONLY_PLUGINS = ('session', 'user', 'setup')
+FLUSH_INTERVAL = 2  # seconds between writes of buffered archive changes
 
 
 def in_pkg(*paths):
@@ -249,6 +252,16 @@ def start(databases, config, no_auth=False, repl=False, debug=False):
     # Srart the server
     logging.info('===== Starting Librarian v%s =====', version)
 
+    optimizer = gspawn.every(config['database.optimize_interval'] * 3600,
+                             database_utils.optimize,
+                             databases)
+    archive = Archive.setup(config['librarian.backend'],
+                            databases.main,
+                            contentdir=config['content.contentdir'],
+                            spooldir=config['content.spooldir'],
+                            meta_filename=config['content.metadata'])
+    flusher = gspawn.every(FLUSH_INTERVAL, archive.flush)
+
     # Install Librarian plugins
     install_plugins(app)
     logging.info('Installed all plugins')
@@ -324,6 +337,9 @@ def start(databases, config, no_auth=False, repl=False, debug=False):
         if repl_thread:
             repl_thread.join()
         servers.stop_all(5)
+        optimizer.kill()
+        flusher.kill()
+        archive.flush()
         for db in databases.values():
             db.close()
         logging.info('Clean shutdown completed')
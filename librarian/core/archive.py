@@ -18,7 +18,7 @@ from .downloads import (ContentError,
                         get_zip_path,
                         get_metadata,
                         get_md5_from_path)
-from .metadata import clean_keys
+from .metadata import clean_keys, get_host, get_rhost
 
 
 FACTORS = {
@@ -151,6 +151,8 @@ class BaseArchive(object):
         meta['md5'] = md5
         meta['updated'] = datetime.datetime.now()
         meta['size'] = os.stat(path).st_size
+        meta['host'] = get_host(meta['url'])
+        meta['rhost'] = get_rhost(meta['host'])
         return meta
 
     def add_meta_to_db(self, metadata, replaced):
@@ -273,6 +275,10 @@ class BaseArchive(object):
     def add_view(self, md5):
         raise NotImplementedError()
 
+    def flush(self):
+        """ Write out any changes the backend has buffered in memory """
+        pass
+
     def add_tags(self, meta, tags):
         raise NotImplementedError()
 
@@ -8,15 +8,50 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
+import re
 import json
+import time
 import logging
+import collections
 
 from ...archive import BaseArchive
-from ...metadata import META_SPECIFICATION
+from ...metadata import META_SPECIFICATION, get_host, get_rhost
 
 
 CONTENT_ORDER = ['-date(updated)', '-views']
-INSERT_KEYS = META_SPECIFICATION.keys()
+INSERT_KEYS = tuple(META_SPECIFICATION)
+# Characters that the full-text tokenizer treats as separators
+NON_TOKEN_RE = re.compile(r'[^\w\s]|_', re.UNICODE)
+# Taggings are counted first, so tag names are joined in once per tag rather
+# than once per tagging
+TAG_CLOUD_SQL = """
+WITH counts AS (SELECT tag_id, COUNT(*) AS count FROM taggings GROUP BY tag_id)
+SELECT name, tag_id, count FROM counts NATURAL JOIN tags
+ORDER BY count DESC, name ASC;
+"""
+# Statements for frequently executed single-row queries, written out so that
+# they need not be built on every call
+GET_SINGLE_SQL = 'SELECT * FROM zipballs WHERE md5 = ?;'
+GET_TAG_NAME_SQL = 'SELECT name FROM tags WHERE tag_id = ?;'
+NEEDS_FORMATTING_SQL = 'SELECT keep_formatting FROM zipballs WHERE md5 = ?;'
+ADD_VIEWS_SQL = 'UPDATE zipballs SET views = views + ? WHERE md5 = ?;'
+INSERT_TAGS_SQL = 'INSERT OR IGNORE INTO tags (name) VALUES %s;'
+INSERT_TAGGINGS_SQL = 'INSERT OR IGNORE INTO taggings (tag_id, md5) VALUES %s;'
+# Maximum number of items bound to a single query (SQLite allows up to 999
+# variables per statement by default)
+MAX_VARIABLES = 500
+# Number of distinct zipballs with buffered views that forces a flush
+VIEWS_FLUSH_COUNT = 100
+# Maximum number of content counts cached per database, least recently used
+# counts are evicted first
+COUNT_CACHE_SIZE = 128
+# Number of seconds for which counts of search results are cached
+SEARCH_COUNT_TTL = 5
+
+# View counts not yet written to the database, keyed by database
+_pending_views = collections.defaultdict(collections.Counter)
+# Content counts and their expiry times, keyed by database and filters
+_counts = collections.defaultdict(collections.OrderedDict)
 
 
 def multiarg(query, n):
@@ -24,11 +59,52 @@ def multiarg(query, n):
     return query.replace('??', ', '.join('?' * n))
 
 
+def rows(n, width=1):
+    """ Returns placeholders for n rows of a multi-row VALUES clause """
+    row = '(%s)' % ', '.join('?' * width)
+    return ', '.join([row] * n)
+
+
+def chunks(seq, n):
+    """ Returns successive slices of sequence that are at most n items long """
+    return (seq[i:i + n] for i in range(0, len(seq), n))
+
+
 def with_tag(q):
     q.sets.natural_join('taggings')
     q.where += 'tag_id = :tag_id'
 
 
+def fts_match(terms):
+    """ Returns full-text MATCH expression for search terms
+
+    Each word in the terms is matched as a prefix. If terms contain characters
+    that cannot be matched using the full-text index, ``None`` is returned.
+    """
+    if NON_TOKEN_RE.search(terms):
+        return None
+    return ' '.join('"%s"*' % t for t in terms.split())
+
+
+def with_terms(q, terms):
+    """ Adds search condition to query and returns value for :terms
+
+    Terms that consist only of whitespace do not add any condition, and
+    ``None`` is returned.
+    """
+    if not terms.split():
+        return None
+    match = fts_match(terms)
+    if match is None:
+        q.where += 'title LIKE :terms'
+        return '%' + terms.lower() + '%'
+    q.sets.join('zipballs_fts', on='zipballs_fts.rowid = zipballs.rowid')
+    q.where += 'zipballs_fts MATCH :terms'
+    if q.order:
+        q.order.parts.insert(0, 'zipballs_fts.rank')
+    return match
+
+
 class EmbeddedArchive(BaseArchive):
 
     def __init__(self, db, **config):
@@ -37,6 +113,24 @@ class EmbeddedArchive(BaseArchive):
         super(EmbeddedArchive, self).__init__(**config)
 
     def get_count(self, terms=None, tag=None, lang=None, multipage=None):
+        """ Return number of content items matching the filters
+
+        Counts are cached until content or tags are modified. Counts of search
+        results are additionally expired after ``SEARCH_COUNT_TTL`` seconds.
+        """
+        counts = _counts[self.db]
+        key = (terms, tag, lang, multipage)
+        try:
+            # Entries are moved to the end when used, so that the least
+            # recently used entries are evicted first
+            count, expires = counts.pop(key)
+        except KeyError:
+            pass
+        else:
+            if expires is None or expires > time.time():
+                counts[key] = (count, expires)
+                return count
+
         q = self.db.Select('COUNT(*) as count', sets='zipballs')
         if tag:
             with_tag(q)
@@ -48,8 +142,7 @@ class EmbeddedArchive(BaseArchive):
             q.where += 'multipage = :multipage'
 
         if terms:
-            terms = '%' + terms.lower() + '%'
-            q.where += 'title LIKE :terms'
+            terms = with_terms(q, terms)
 
         self.db.query(q,
                       terms=terms,
@@ -57,12 +150,22 @@ class EmbeddedArchive(BaseArchive):
                       lang=lang,
                       multipage=multipage)
 
-        return self.db.result.count
+        count = self.db.result.count
+        expires = time.time() + SEARCH_COUNT_TTL if terms else None
+        counts[key] = (count, expires)
+        if len(counts) > COUNT_CACHE_SIZE:
+            counts.popitem(last=False)
+        return count
+
+    def clear_counts(self):
+        """ Discard cached content counts """
+        _counts.pop(self.db, None)
 
     def get_content(self, terms=None, offset=0, limit=0, tag=None, lang=None,
                     multipage=None):
         # TODO: tests
-        q = self.db.Select(sets='zipballs',
+        q = self.db.Select('zipballs.*',
+                           sets='zipballs',
                            order=CONTENT_ORDER,
                            limit=limit,
                            offset=offset)
@@ -76,8 +179,7 @@ class EmbeddedArchive(BaseArchive):
             q.where += 'multipage = :multipage'
 
         if terms:
-            terms = '%' + terms.lower() + '%'
-            q.where += 'title LIKE :terms'
+            terms = with_terms(q, terms)
 
         self.db.query(q,
                       terms=terms,
@@ -88,57 +190,66 @@ class EmbeddedArchive(BaseArchive):
         return self.db.results
 
     def get_single(self, md5):
-        q = self.db.Select(sets='zipballs', where='md5 = ?')
-        self.db.query(q, md5)
+        self.db.query(GET_SINGLE_SQL, md5)
         return self.db.result
 
     def get_titles(self, ids):
-        q = self.db.Select(['title', 'md5'],
-                           sets='zipballs',
-                           where=self.sqlin('md5', ids))
-        self.db.query(q, *ids)
-        return self.db.results
+        titles = []
+        for md5s in chunks(ids, MAX_VARIABLES):
+            q = self.db.Select(['title', 'md5'],
+                               sets='zipballs',
+                               where=self.sqlin('md5', md5s))
+            self.db.query(q, *md5s)
+            titles.extend(self.db.results)
+        return titles
 
     def content_for_domain(self, domain):
-        # TODO: tests
+        # Reversed host names of subdomains start with the reversed domain
+        # followed by '.', so they sort between it and the same prefix ending
+        # in '/' (the next character), and can be looked up in the index
+        rhost = get_rhost(get_host(domain))
         q = self.db.Select(sets='zipballs',
-                           where='url LIKE :domain',
-                           order=CONTENT_ORDER)
-        domain = '%' + domain.lower() + '%'
-        self.db.query(q, domain=domain)
-        return self.db.results
+                           where=('rhost = :rhost OR '
+                                  '(rhost > :lower AND rhost < :upper)'),
+                           order=CONTENT_ORDER,
+                           limit=1)
+        self.db.query(q, rhost=rhost, lower=rhost + '.', upper=rhost + '/')
+        return self.db.result
 
     def add_meta_to_db(self, metadata, replaced):
+        self.clear_counts()
         with self.db.transaction() as cur:
             logging.debug("Adding new content to archive database")
             q = self.db.Replace('zipballs', cols=INSERT_KEYS)
             self.db.executemany(q, metadata)
             rowcount = cur.rowcount
             logging.debug("Removing replaced content from archive database")
-            if replaced:
-                q = self.db.Delete('zipballs',
-                                   where=self.sqlin('md5', replaced))
-
-            self.db.executemany(q, replaced)
+            for md5s in chunks(replaced, MAX_VARIABLES):
+                q = self.db.Delete('zipballs', where=self.sqlin('md5', md5s))
+                self.db.query(q, *md5s)
 
         return rowcount
 
     def remove_meta_from_db(self, hashes):
+        self.clear_counts()
         with self.db.transaction() as cur:
-            in_md5s = self.sqlin('md5', hashes)
             msg = "Removing %s items from archive database" % len(hashes)
             logging.debug(msg)
-            q = self.db.Delete('zipballs', where=in_md5s)
-            self.db.query(q, *hashes)
-            rowcount = cur.rowcount
-            q = self.db.Delete('taggings', where=in_md5s)
-            self.db.query(q, *hashes)
+            rowcount = 0
+            for md5s in chunks(hashes, MAX_VARIABLES):
+                in_md5s = self.sqlin('md5', md5s)
+                q = self.db.Delete('zipballs', where=in_md5s)
+                self.db.query(q, *md5s)
+                rowcount += cur.rowcount
+                q = self.db.Delete('taggings', where=in_md5s)
+                self.db.query(q, *md5s)
             return rowcount
 
     def clear_and_reload(self):
         logging.debug('Content refill started.')
         q = self.db.Delete('zipballs')
         self.db.query(q)
+        self.clear_counts()
         rows = self.reload_data()
         logging.info('Content refill finished for %s pieces of content', rows)
 
@@ -158,37 +269,64 @@ class EmbeddedArchive(BaseArchive):
     def add_view(self, md5):
         """ Increments the viewcount for zipball with specified MD5
 
+        The increment is buffered in memory, and written to the database in
+        a single transaction together with other buffered views when
+        ``flush()`` is called or when enough views are buffered.
+
         :param md5:     MD5 of the zipball
-        :returns:       ``True`` if successful, ``False`` otherwise
+        :returns:       ``True``
         """
-        q = self.db.Update('zipballs', views='views + 1', where='md5 = ?')
-        self.db.query(q, md5)
-        assert self.db.cursor.rowcount == 1, 'Updated more than one row'
-        return self.db.cursor.rowcount
+        views = _pending_views[self.db]
+        views[md5] += 1
+        if len(views) >= VIEWS_FLUSH_COUNT:
+            self.flush()
+        return True
+
+    def flush(self):
+        """ Write buffered view counts to the database """
+        views = _pending_views.pop(self.db, None)
+        if not views:
+            return
+        try:
+            with self.db.transaction():
+                self.db.executemany(ADD_VIEWS_SQL,
+                                    ((n, md5) for md5, n in views.items()))
+        except Exception:
+            # Keep the views buffered so they are written on the next flush
+            _pending_views[self.db].update(views)
+            raise
 
     def add_tags(self, meta, tags):
         """ Take content data and comma-separated tags and add the taggings """
         if not tags:
             return
 
+        self.clear_counts()
+        names = list(tags)
+
         # First ensure all tags exist
         with self.db.transaction():
-            q = self.db.Insert('tags', cols=('name',))
-            self.db.executemany(q, ({'name': t} for t in tags))
+            for chunk in chunks(names, MAX_VARIABLES):
+                self.db.query(INSERT_TAGS_SQL % rows(len(chunk)), *chunk)
 
         # Get the IDs of the tags
-        q = self.db.Select(sets='tags', where=self.sqlin('name', tags))
-        self.db.query(q, *tags)
-        tags = self.db.results
-        ids = (i['tag_id'] for i in tags)
+        tags = []
+        for chunk in chunks(names, MAX_VARIABLES):
+            q = self.db.Select(sets='tags', where=self.sqlin('name', chunk))
+            self.db.query(q, *chunk)
+            tags.extend(self.db.results)
 
         # Create taggings
-        pairs = ({'md5': meta.md5, 'tag_id': i} for i in ids)
         tags_dict = {t['name']: t['tag_id'] for t in tags}
         meta.tags.update(tags_dict)
+        ids = list(tags_dict.values())
         with self.db.transaction():
-            q = self.db.Insert('taggings', cols=('tag_id', 'md5'))
-            self.db.executemany(q, pairs)
+            for chunk in chunks(ids, MAX_VARIABLES // 2):
+                params = []
+                for tag_id in chunk:
+                    params.extend((tag_id, meta.md5))
+                self.db.query(INSERT_TAGGINGS_SQL % rows(len(chunk), 2),
+                              *params)
             q = self.db.Update('zipballs', tags=':tags', where='md5 = :md5')
             self.db.query(q, md5=meta.md5, tags=json.dumps(meta.tags))
 
@@ -200,6 +338,7 @@ class EmbeddedArchive(BaseArchive):
         if not tags:
             return
 
+        self.clear_counts()
         tag_ids = [meta.tags[name] for name in tags]
         meta.tags = dict((n, i) for n, i in meta.tags.items() if n not in tags)
         with self.db.transaction():
@@ -211,22 +350,14 @@ class EmbeddedArchive(BaseArchive):
             self.db.query(q, md5=meta.md5, tags=json.dumps(meta.tags))
 
     def get_tag_name(self, tag_id):
-        q = self.db.Select('name', sets='tags', where='tag_id = ?')
-        self.db.query(q, tag_id)
+        self.db.query(GET_TAG_NAME_SQL, tag_id)
         return self.db.result
 
     def get_tag_cloud(self):
-        q = self.db.Select(
-            ['name', 'tag_id', 'COUNT(taggings.tag_id) as count'],
-            sets=self.db.From('tags', 'taggings', join='NATURAL'),
-            group='taggings.tag_id',
-            order=['-count', 'name']
-        )
-        self.db.query(q)
+        self.db.query(TAG_CLOUD_SQL)
         return self.db.results
 
     def needs_formatting(self, md5):
         """ Whether content needs formatting patch """
-        q = self.db.Select('keep_formatting', sets='zipballs', where='md5 = ?')
-        self.db.query(q, md5)
+        self.db.query(NEEDS_FORMATTING_SQL, md5)
         return not self.db.result.keep_formatting
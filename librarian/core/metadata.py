@@ -11,9 +11,10 @@ file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 from __future__ import unicode_literals
 
 import os
+import re
 import json
-import glob
 import logging
+import urlparse
 import zipfile
 
 import dateutil.parser
@@ -23,7 +24,11 @@ def default_broadcast(key, meta):
     return dateutil.parser.parse(meta['timestamp']).date()
 
 
-RTL_LANGS = ['ar', 'he', 'ur', 'yi', 'ji', 'iw', 'fa']
+RTL_LANGS = frozenset(['ar', 'he', 'ur', 'yi', 'ji', 'iw', 'fa'])
+
+IMAGE_EXTENSIONS = ('.png', '.gif', '.jpg', '.jpeg')
+# Matches filenames with any of the ``IMAGE_EXTENSIONS``
+IMAGE_RE = re.compile(r'\.(png|gif|jpe?g)$', re.IGNORECASE)
 
 # FIXME: This is a dummy gettext to cause the strings to be extracted.
 _ = lambda x: x
@@ -82,7 +87,9 @@ META_SPECIFICATION = {
     'keywords': {'default': ''},
     'md5': {'auto': True},
     'size': {'auto': True},
-    'updated': {'auto': True}
+    'updated': {'auto': True},
+    'host': {'auto': True},
+    'rhost': {'auto': True}
 }
 
 STANDARD_FIELDS = dict((k, v) for k, v in META_SPECIFICATION.items()
@@ -92,6 +99,13 @@ STANDARD_FIELDS = dict((k, v) for k, v in META_SPECIFICATION.items()
 REQUIRED_KEYS = [k for k, v in META_SPECIFICATION.items()
                  if v.get('required', False)]
 
+# Precomputed lookups used when processing metadata
+STANDARD_KEYS = frozenset(STANDARD_FIELDS)
+DEFAULT_VALUES = tuple((k, v.get('default', None))
+                       for k, v in STANDARD_FIELDS.items())
+ALIASES = tuple((k, v['aliases']) for k, v in STANDARD_FIELDS.items()
+                if v.get('aliases'))
+
 
 class MetadataError(Exception):
     """ Base metadata error """
@@ -107,6 +121,35 @@ class FormatError(MetadataError):
     pass
 
 
+def get_host(url):
+    """ Return normalized host name of an URL or domain
+
+    Host names are lowercased, and stripped of the port number and the leading
+    'www.', so that different ways of writing the same domain match.
+
+    :param url:     URL or domain name
+    :returns:       host name
+    """
+    if '//' not in url:
+        url = '//' + url
+    host = urlparse.urlparse(url).hostname or ''
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+def get_rhost(host):
+    """ Return host name with its characters in reverse order
+
+    Subdomains of a reversed host name share its prefix, so they can be looked
+    up using an index.
+
+    :param host:    host name as returned by :py:func:`get_host`
+    :returns:       reversed host name
+    """
+    return host[::-1]
+
+
 def get_default_value(key, meta):
     default = STANDARD_FIELDS[key].get('default', None)
     if callable(default):
@@ -130,9 +173,9 @@ def add_missing_keys(meta):
 
     :param meta:    metadata dict
     """
-    for key in STANDARD_FIELDS:
+    for key, default in DEFAULT_VALUES:
         if key not in meta:
-            meta[key] = get_default_value(key, meta)
+            meta[key] = default(key, meta) if callable(default) else default
 
 
 def replace_aliases(meta):
@@ -143,9 +186,9 @@ def replace_aliases(meta):
 
     :param meta:    metadata dict
     """
-    for key in STANDARD_FIELDS:
+    for key, aliases in ALIASES:
         if key not in meta:
-            for alias in get_aliases_for(key):
+            for alias in aliases:
                 if alias in meta:
                     meta[key] = meta.pop(alias)
 
@@ -158,10 +201,8 @@ def clean_keys(meta):
 
     :param meta:    metadta dict
     """
-    valid_keys = STANDARD_FIELDS.keys()
-    for key in meta.keys():
-        if key not in valid_keys:
-            del meta[key]
+    for key in set(meta) - STANDARD_KEYS:
+        del meta[key]
 
 
 def convert_json(meta):
@@ -190,6 +231,41 @@ def convert_json(meta):
     return meta
 
 
+# Keys that are copied onto ``Meta`` instances as regular attributes
+HOT_FIELDS = ('md5', 'title', 'url', 'language', 'publisher', 'license',
+              'is_sponsored', 'is_partner', 'archive')
+HOT_FIELD_SET = frozenset(HOT_FIELDS)
+
+_MISSING = object()
+
+
+# Filenames of cover images known to exist, keyed by cover dir and content ID
+_cover_cache = {}
+
+
+def find_cover(cover_dir, md5):
+    """ Find the cover image for specified content in the cover directory
+
+    Results are cached in memory, so the cover directory is only checked until
+    the cover is found.
+
+    :param cover_dir:   directory path where content covers are stored
+    :param md5:         content ID
+    :returns:           filename (not full path) of the cover or ``None``
+    """
+    key = (cover_dir, md5)
+    try:
+        return _cover_cache[key]
+    except KeyError:
+        pass
+    for ext in IMAGE_EXTENSIONS:
+        filename = md5 + ext
+        if os.path.exists(os.path.join(cover_dir, filename)):
+            _cover_cache[key] = filename
+            return filename
+    return None
+
+
 class Meta(object):
     """ Metadata wrapper with additional methods for easier consumption
 
@@ -202,7 +278,10 @@ class Meta(object):
     class at a later time.
     """
 
-    IMAGE_EXTENSIONS = ('.png', '.gif', '.jpg', '.jpeg')
+    __slots__ = ('meta', 'tags', '_image', 'cover_dir', 'zip_path', 'lang',
+                 'rtl') + HOT_FIELDS
+
+    IMAGE_EXTENSIONS = IMAGE_EXTENSIONS
 
     def __init__(self, meta, cover_dir, zip_path=None):
         """ Metadata wrapper instantiation
@@ -222,6 +301,11 @@ class Meta(object):
         self._image = None
         self.cover_dir = os.path.normpath(cover_dir)
         self.zip_path = zip_path
+        for key in HOT_FIELDS:
+            value = meta.get(key, _MISSING)
+            if value is not _MISSING:
+                setattr(self, key, value)
+        self.update_lang()
 
     def __getattr__(self, attr):
         try:
@@ -234,9 +318,17 @@ class Meta(object):
 
     def __setitem__(self, key, value):
         self.meta[key] = value
+        if key in HOT_FIELD_SET:
+            setattr(self, key, value)
+        if key == 'language':
+            self.update_lang()
 
     def __delitem__(self, key):
         del self.meta[key]
+        if key in HOT_FIELD_SET and hasattr(self, key):
+            delattr(self, key)
+        if key == 'language':
+            self.update_lang()
 
     def __contains__(self, key):
         return key in self.meta
@@ -273,43 +365,36 @@ class Meta(object):
         cover_path = os.path.join(self.cover_dir, '%s%s' % (self.md5, ext))
         with open(cover_path, 'wb') as f:
             f.write(content)
-        return os.path.basename(cover_path)
+        filename = os.path.basename(cover_path)
+        _cover_cache[(self.cover_dir, self.md5)] = filename
+        return filename
 
     def extract_image(self):
-        with open(self.zip_path, 'rb') as f:
-            z = zipfile.ZipFile(f)
-            for name in z.namelist():
-                extension = os.path.splitext(name)[1].lower()
-                if extension in self.IMAGE_EXTENSIONS:
-                    content = z.open(name, 'r').read()
-                    return extension, content
+        with zipfile.ZipFile(self.zip_path) as z:
+            for info in z.infolist():
+                match = IMAGE_RE.search(info.filename)
+                if match:
+                    with z.open(info) as f:
+                        return match.group(0).lower(), f.read()
             return None, None
 
     def get_cover_path(self):
-        cover_path = os.path.join(self.cover_dir, '%s.*' % self.md5)
-        g = glob.glob(cover_path)
-        try:
-            return os.path.basename(g[0])
-        except IndexError:
-            return None
+        return find_cover(self.cover_dir, self.md5)
 
-    @property
-    def lang(self):
-        return self.meta.get('language')
-
-    @property
-    def rtl(self):
-        return self.lang in RTL_LANGS
+    def update_lang(self):
+        """ Refresh ``lang`` and ``rtl`` attributes from the language key """
+        self.lang = lang = self.meta.get('language')
+        self.rtl = lang in RTL_LANGS
 
     @property
     def i18n_attrs(self):
-        s = ''
-        if self.lang:
-            # XXX: Do we want to keep the leading space?
-            s += ' lang="%s"' % self.lang
+        lang = self.lang
+        if not lang:
+            return ''
+        # XXX: Do we want to keep the leading space?
         if self.rtl:
-            s += ' dir="rtl"'
-        return s
+            return ' lang="%s" dir="rtl"' % lang
+        return ' lang="%s"' % lang
 
     @property
     def label(self):
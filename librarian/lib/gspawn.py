@@ -8,6 +8,8 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
+import logging
+
 import gevent
 
 
@@ -45,3 +47,26 @@ def call(_callable, *args, **kwargs):
         return g.get(timeout=timeout)
     except gevent.Timeout:
         raise TimeoutError()
+
+
+def every(_seconds, _callable, *args, **kwargs):
+    """ Spawns a greenlet that calls the callable at regular intervals
+
+    The callable is first called after ``_seconds`` have passed, and then
+    repeatedly after each subsequent interval until the greenlet is killed.
+    Exceptions raised by the callable are logged and do not stop the loop.
+    Any extra arguments and keyword arguments passed to this function will be
+    passed to the callable.
+
+    :param _seconds:    interval in seconds
+    :param _callable:   object to call
+    :returns:           greenlet object
+    """
+    def loop():
+        while True:
+            gevent.sleep(_seconds)
+            try:
+                _callable(*args, **kwargs)
+            except Exception:
+                logging.exception('Periodic call to %s failed', _callable)
+    return gevent.spawn(loop)
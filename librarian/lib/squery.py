@@ -59,14 +59,30 @@ class Connection(object):
         # Allow manual transaction handling, see http://bit.ly/1C7E7EQ
         self._conn.isolation_level = None
         # More on WAL: https://www.sqlite.org/isolation.html
-        # Requires SQLite >= 3.7.0
+        # Requires SQLite >= 3.7.0. The migrations require SQLite >= 3.27.0
+        # built with FTS5, see migrations/main/15_add_fulltext_search.py
         cur = self._conn.cursor()
         cur.execute('PRAGMA journal_mode=WAL;')
+        # In WAL mode, syncing on checkpoints only is still corruption-safe
+        cur.execute('PRAGMA synchronous=NORMAL;')
+        cur.execute('PRAGMA cache_size=-20000;')
+        cur.execute('PRAGMA temp_store=MEMORY;')
+        cur.execute('PRAGMA mmap_size=268435456;')
+        # Let SQLite refresh query planner statistics where they are missing
+        # or stale. See https://www.sqlite.org/pragma.html#pragma_optimize
+        cur.execute('PRAGMA optimize=0x10002;')
         logging.debug('Connected to database {}'.format(self.path))
 
     def close(self):
         self._conn.commit()
-        self._conn.close()
+        try:
+            self._conn.execute('PRAGMA optimize;')
+        except sqlite3.OperationalError as err:
+            # Other connections may hold a lock, statistics can wait
+            logging.debug('Could not optimize database {}: {}'.format(
+                self.path, err))
+        finally:
+            self._conn.close()
 
     def __getattr__(self, attr):
         return getattr(self._conn, attr)
@@ -151,6 +167,9 @@ class Database(object):
     def refresh_table_stats(self):
         self.execute('ANALYZE sqlite_master;')
 
+    def optimize(self):
+        self.execute('PRAGMA optimize;')
+
     def acquire_lock(self):
         self.execute('BEGIN EXCLUSIVE;')
 
@@ -0,0 +1,64 @@
+# remove_diacritics 2 and the date() expression indexes of later migrations
+# require SQLite 3.27.0
+MIN_VERSION = (3, 27, 0)
+CHECK_SQL = """
+select sqlite_version() as version,
+       sqlite_compileoption_used('ENABLE_FTS5') as fts5;
+"""
+SQL = """
+create virtual table zipballs_fts using fts5
+(
+    title,
+    keywords,
+    content='zipballs',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+insert into zipballs_fts(zipballs_fts) values ('rebuild');
+
+-- ``replace into`` deletes the conflicting row without firing delete
+-- triggers, so the stale index entry is removed before the insert happens
+create trigger zipballs_fts_bi before insert on zipballs
+begin
+    insert into zipballs_fts(zipballs_fts, rowid, title, keywords)
+    select 'delete', rowid, title, keywords from zipballs
+    where md5 = new.md5;
+end;
+
+create trigger zipballs_fts_ai after insert on zipballs
+begin
+    insert into zipballs_fts(rowid, title, keywords)
+    values (new.rowid, new.title, new.keywords);
+end;
+
+create trigger zipballs_fts_ad after delete on zipballs
+begin
+    insert into zipballs_fts(zipballs_fts, rowid, title, keywords)
+    values ('delete', old.rowid, old.title, old.keywords);
+end;
+
+create trigger zipballs_fts_au after update of title, keywords on zipballs
+begin
+    insert into zipballs_fts(zipballs_fts, rowid, title, keywords)
+    values ('delete', old.rowid, old.title, old.keywords);
+    insert into zipballs_fts(rowid, title, keywords)
+    values (new.rowid, new.title, new.keywords);
+end;
+"""
+
+
+def check_sqlite(db):
+    db.query(CHECK_SQL)
+    row = db.result
+    version = tuple(int(n) for n in row.version.split('.')[:3])
+    if version < MIN_VERSION or not row.fts5:
+        raise RuntimeError(
+            'SQLite >= {} with FTS5 is required, found {}{}'.format(
+                '.'.join(str(n) for n in MIN_VERSION), row.version,
+                '' if row.fts5 else ' without FTS5'))
+
+
+def up(db, conf):
+    check_sqlite(db)
+    db.executescript(SQL)
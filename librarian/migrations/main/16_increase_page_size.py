@@ -0,0 +1,13 @@
+SQL = """
+pragma journal_mode=DELETE;
+pragma page_size=8192;
+vacuum;
+pragma journal_mode=WAL;
+
+-- vacuum may renumber rowids, which the full-text index is keyed on
+insert into zipballs_fts(zipballs_fts) values ('rebuild');
+"""
+
+
+def up(db, conf):
+    db.executescript(SQL)
@@ -0,0 +1,13 @@
+SQL = """
+create index zipballs_updated_idx
+on zipballs (date(updated) desc, views desc);
+
+create index zipballs_language_multipage_updated_idx
+on zipballs (language, multipage, date(updated) desc, views desc);
+
+analyze zipballs;
+"""
+
+
+def up(db, conf):
+    db.executescript(SQL)
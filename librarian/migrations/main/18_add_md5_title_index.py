@@ -0,0 +1,9 @@
+SQL = """
+create index zipballs_md5_title_idx on zipballs (md5, title);
+
+analyze zipballs;
+"""
+
+
+def up(db, conf):
+    db.executescript(SQL)
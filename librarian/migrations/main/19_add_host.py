@@ -0,0 +1,26 @@
+import urlparse
+
+ADD_SQL = 'alter table zipballs add column host varchar;'
+SELECT_SQL = 'select md5, url from zipballs;'
+UPDATE_SQL = 'update zipballs set host = ? where md5 = ?;'
+INDEX_SQL = """
+create index zipballs_host_updated_idx
+on zipballs (host, date(updated) desc, views desc);
+"""
+
+
+def get_host(url):
+    if '//' not in url:
+        url = '//' + url
+    host = urlparse.urlparse(url).hostname or ''
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+def up(db, conf):
+    db.query(ADD_SQL)
+    db.query(SELECT_SQL)
+    hosts = [(get_host(row.url), row.md5) for row in db.results]
+    db.executemany(UPDATE_SQL, hosts)
+    db.query(INDEX_SQL)
@@ -0,0 +1,10 @@
+SQL = """
+create index zipballs_language_updated_idx
+on zipballs (language, date(updated) desc, views desc);
+
+analyze zipballs;
+"""
+
+
+def up(db, conf):
+    db.executescript(SQL)
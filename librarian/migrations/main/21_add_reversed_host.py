@@ -0,0 +1,19 @@
+ADD_SQL = 'alter table zipballs add column rhost varchar;'
+SELECT_SQL = 'select md5, host from zipballs;'
+UPDATE_SQL = 'update zipballs set rhost = ? where md5 = ?;'
+INDEX_SQL = """
+drop index zipballs_host_updated_idx;
+
+create index zipballs_rhost_updated_idx
+on zipballs (rhost, date(updated) desc, views desc);
+
+analyze zipballs;
+"""
+
+
+def up(db, conf):
+    db.query(ADD_SQL)
+    db.query(SELECT_SQL)
+    rhosts = [((row.host or '')[::-1], row.md5) for row in db.results]
+    db.executemany(UPDATE_SQL, rhosts)
+    db.executescript(INDEX_SQL)
@@ -12,19 +12,72 @@ import os
 import logging
 from datetime import datetime
 
+from gevent.threadpool import ThreadPool
+
 from bottle import request, mako_view as view, redirect
 from bottle_utils.i18n import i18n_url, lazy_gettext as _
 
 from ..core import metadata
 from ..core import downloads
 from ..lib.pager import Pager
-from ..utils.cache import cached
 from ..utils.core_helpers import open_archive
 
 
-get_metadata = cached()(downloads.get_metadata)
-
 PER_PAGE = 20
+METADATA_WORKERS = 4
+
+metadata_pool = ThreadPool(METADATA_WORKERS)
+_metadata_cache = {}
+
+
+def read_metadata(key):
+    """ Read metadata for a ``(path, timestamp, meta_filename)`` key
+
+    :param key:     cache key
+    :returns:       two-tuple of metadata dict and ``ContentError``, one of
+                    which is always ``None``
+    """
+    path, _, meta_filename = key
+    try:
+        return downloads.get_metadata(path, meta_filename), None
+    except downloads.ContentError as err:
+        return None, err
+
+
+def get_metadata(zipballs, meta_filename):
+    """ Return metadata for zipballs, reading uncached ones concurrently
+
+    Metadata is cached by zipball path and modification timestamp, so
+    unchanged zipballs are not read again. Only the zipballs passed to the
+    latest call are kept in the cache. Files are read in a pool of OS threads,
+    since gevent cannot multiplex disk I/O.
+
+    :param zipballs:        iterable of ``(path, timestamp)`` two-tuples
+    :param meta_filename:   name of the metadata file within zipballs
+    :returns:               list of ``(path, timestamp, meta, error)``
+                            tuples in the order of ``zipballs``
+    """
+    keys = [(path, ts, meta_filename) for path, ts in zipballs]
+    # Cached metadata is copied before yielding to the thread pool, because
+    # concurrent calls may purge it from the cache in the meantime
+    metas = {key: _metadata_cache[key]
+             for key in keys if key in _metadata_cache}
+    missing = [key for key in keys if key not in metas]
+    errors = {}
+    for key, (meta, err) in zip(missing,
+                                metadata_pool.map(read_metadata, missing)):
+        if err is None:
+            metas[key] = _metadata_cache[key] = meta
+        else:
+            errors[key] = err
+    results = []
+    for key in keys:
+        path, ts, _ = key
+        results.append((path, ts, metas.get(key), errors.get(key)))
+    # Forget zipballs that were removed from the spool or modified since
+    for key in set(_metadata_cache).difference(keys):
+        del _metadata_cache[key]
+    return results
 
 
 @view('downloads', vals={})
@@ -52,17 +105,8 @@ def list_downloads():
     # Collect metadata of valid zipballs. If a language filter is specified
     # filter the list based on that.
     metas = []
-    for z, ts in zipballs:
-        logging.debug("<%s> getting metas" % z)
-        try:
-            meta = get_metadata(z, conf['content.metadata'])
-            if lang and meta['language'] != lang:
-                continue
-
-            meta['md5'] = downloads.get_md5_from_path(z)
-            meta['ftimestamp'] = datetime.fromtimestamp(ts)
-            metas.append(metadata.Meta(meta, cover_dir, zip_path=z))
-        except downloads.ContentError as err:
+    for z, ts, meta, err in get_metadata(zipballs, conf['content.metadata']):
+        if err is not None:
             # Zip file is invalid. This means that the file is corrupted or the
             # original file was signed with corrupt data in it. Either way, we
             # don't know what to do with the file so we'll remove it.
@@ -70,6 +114,15 @@ def list_downloads():
             os.unlink(z)
             continue
 
+        if lang and meta['language'] != lang:
+            continue
+
+        # cached metadata is shared between requests, so work on a copy
+        meta = dict(meta)
+        meta['md5'] = downloads.get_md5_from_path(z)
+        meta['ftimestamp'] = datetime.fromtimestamp(ts)
+        metas.append(metadata.Meta(meta, cover_dir, zip_path=z))
+
     pager = Pager(metas, pid='downloads')
     pager.get_paging_params()
     metas_on_page = pager.get_items()
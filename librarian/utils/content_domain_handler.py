@@ -14,22 +14,15 @@ import functools
 from bottle import request, redirect
 from bottle_utils.i18n import i18n_url
 
-from ..core.archive import Archive
 from . import netutils
+from .core_helpers import open_archive
 
 
 def get_content_url(root_url, domain):
-    conf = request.app.config
-    archive = Archive.setup(conf['librarian.backend'],
-                            request.db.main,
-                            contentdir=conf['content.contentdir'],
-                            spooldir=conf['content.spooldir'],
-                            meta_filename=conf['content.metadata'])
-    matched_contents = archive.content_for_domain(domain)
-    try:
-        # as multiple matches are possible, pick the first one
-        meta = matched_contents[0]
-    except IndexError:
+    archive = open_archive()
+    # as multiple matches are possible, only the first one is returned
+    meta = archive.content_for_domain(domain)
+    if meta is None:
         # invalid content domain
         path = 'content-not-found'
     else:
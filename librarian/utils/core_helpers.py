@@ -18,13 +18,27 @@ from ..core.archive import Archive
 from ..core.files import FileManager
 
 
+_archives = {}
+
+
 def open_archive():
     conf = request.app.config
-    return Archive.setup(conf['librarian.backend'],
-                         request.db.main,
-                         contentdir=conf['content.contentdir'],
-                         spooldir=conf['content.spooldir'],
-                         meta_filename=conf['content.metadata'])
+    db = request.db.main
+    key = (conf['librarian.backend'],
+           conf['content.contentdir'],
+           conf['content.spooldir'],
+           conf['content.metadata'],
+           id(db))
+    try:
+        return _archives[key]
+    except KeyError:
+        archive = _archives[key] = Archive.setup(
+            conf['librarian.backend'],
+            db,
+            contentdir=conf['content.contentdir'],
+            spooldir=conf['content.spooldir'],
+            meta_filename=conf['content.metadata'])
+        return archive
 
 
 def init_filemanager():
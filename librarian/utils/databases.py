@@ -9,6 +9,7 @@ file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
 import os
+import logging
 
 
 def get_database_path(conf, name):
@@ -21,3 +22,13 @@ def get_database_configs(conf):
     for db_name in names:
         databases[db_name] = get_database_path(conf, db_name)
     return databases
+
+
+def optimize(databases):
+    """ Refresh query planner statistics of all databases
+
+    :param databases:   mapping of database names to database objects
+    """
+    for db_name, db in databases.items():
+        logging.debug('Optimizing database {}'.format(db_name))
+        db.optimize()
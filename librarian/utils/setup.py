@@ -8,13 +8,26 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
+import errno
 import functools
 import json
 import logging
 import os
 
+import gevent
 from bottle import request, redirect
 
+try:
+    from orjson import loads as json_loads, dumps as json_dumps
+except ImportError:
+    try:
+        from simdjson import loads as json_loads
+    except ImportError:
+        json_loads = json.loads
+
+    def json_dumps(data):
+        return json.dumps(data, separators=(',', ':')).encode('utf8')
+
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +42,7 @@ def autoconfigurator(name):
 
 
 class Setup(object):
+    __slots__ = ('setup_file', 'data', 'is_completed')
 
     def __init__(self, setup_file):
         self.setup_file = setup_file
@@ -48,18 +62,43 @@ class Setup(object):
 
     def load(self):
         """Attempt loading the setup data file."""
-        if os.path.exists(self.setup_file):
-            with open(self.setup_file, 'r') as s_file:
-                try:
-                    return json.load(s_file)
-                except Exception as exc:
-                    msg = 'Setup file loading failed: {0}'.format(str(exc))
-                    logger.error(msg)
+        try:
+            s_file = open(self.setup_file, 'rb')
+        except IOError as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+            return None
+        with s_file:
+            try:
+                return json_loads(s_file.read())
+            except Exception as exc:
+                msg = 'Setup file loading failed: {0}'.format(str(exc))
+                logger.error(msg)
 
     def append(self, new_data):
         self.data.update(new_data)
-        with open(self.setup_file, 'w') as s_file:
-            json.dump(self.data, s_file)
+        # The data is written to a temporary file which then replaces the
+        # setup file, so power loss cannot leave a partially written file
+        tmp_path = self.setup_file + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as s_file:
+                s_file.write(json_dumps(self.data))
+                s_file.flush()
+                os.fsync(s_file.fileno())
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        if os.name == 'nt':
+            # Rename does not replace existing files on Windows
+            try:
+                os.unlink(self.setup_file)
+            except OSError as exc:
+                if exc.errno != errno.ENOENT:
+                    raise
+        os.rename(tmp_path, self.setup_file)
 
     def save(self, new_data):
         """Save the setup data file."""
@@ -68,19 +107,31 @@ class Setup(object):
         self.is_completed = True
 
     def auto_configure(self):
-        data = dict()
-        for name, configurator in AUTO_CONFIGURATORS.items():
-            data[name] = configurator()
-        return data
+        greenlets = {name: gevent.spawn(configurator)
+                     for name, configurator in AUTO_CONFIGURATORS.items()}
+        try:
+            gevent.joinall(greenlets.values(), raise_error=True)
+        except Exception:
+            # Do not leave other configurators running after a failure
+            gevent.killall(greenlets.values())
+            raise
+        return {name: greenlet.value for name, greenlet in greenlets.items()}
 
 
 def setup_plugin(setup_path):
+    # Module globals are bound to closure variables, which are faster to look
+    # up in the wrapper that runs on every request
+    _request = request
+    _redirect = redirect
+
     def plugin(callback):
         @functools.wraps(callback)
         def wrapper(*args, **kwargs):
-            if (not request.app.setup.is_completed and
-                    request.path != setup_path[len(request.locale) + 1:]):
-                return redirect(setup_path)
+            # Setup is normally completed, so check that before anything else
+            if _request.app.setup.is_completed:
+                return callback(*args, **kwargs)
+            if _request.path != setup_path[len(_request.locale) + 1:]:
+                return _redirect(setup_path)
             return callback(*args, **kwargs)
         return wrapper
     plugin.name = 'setup'
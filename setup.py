@@ -3,6 +3,7 @@
 import os
 import sys
 import shutil
+import compileall
 from subprocess import check_output
 from distutils.cmd import Command
 from setuptools import setup, find_packages
@@ -72,6 +73,17 @@ def clean_pyc():
                 shutil.rmtree(path)
 
 
+def compile_pyc():
+    """ Byte-compile sources so they are not compiled on first import
+
+    Devices may run librarian from a read-only filesystem, in which case
+    bytecode cannot be cached on import and every module is compiled again on
+    each start.
+    """
+    print("compiling sources in '%s'" % SCRIPTDIR)
+    compileall.compile_dir(in_scriptdir('librarian'), quiet=1)
+
+
 class PyTest(TestCommand):
     user_options = [('pytest-args=', 'a', 'Arguments for py.test')]
 
@@ -110,6 +122,20 @@ class Clean(Command):
         clean_pyc()
 
 
+class Compile(Command):
+    description = 'byte-compile librarian sources in place'
+    user_options = []
+
+    def initialize_options(self):
+        pass
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        compile_pyc()
+
+
 setup(
     name='librarian',
     version=VERSION,
@@ -139,5 +165,6 @@ setup(
         'develop': Develop,
         'sdist': Package,
         'uncache': Clean,
+        'precompile': Compile,
     },
 )
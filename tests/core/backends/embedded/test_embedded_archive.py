@@ -29,6 +29,54 @@ def mock_cursor(func):
     return _mock_cursor
 
 
+def test_chunks():
+    assert list(mod.chunks([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+    assert list(mod.chunks([1, 2], 2)) == [[1, 2]]
+    assert list(mod.chunks([], 2)) == []
+
+
+def test_rows():
+    assert mod.rows(1) == '(?)'
+    assert mod.rows(2) == '(?), (?)'
+    assert mod.rows(2, 2) == '(?, ?), (?, ?)'
+
+
+@mock_cursor
+def test_add_meta_to_db(cursor, archive):
+    metadata = [{'md5': 'foo'}, {'md5': 'bar'}]
+    replaced = ['baz', 'qux']
+    cursor.rowcount = len(metadata)
+    archive.db.Delete.return_value = 'proper delete query'
+
+    result = archive.add_meta_to_db(metadata, replaced)
+
+    archive.db.executemany.assert_called_once_with(
+        archive.db.Replace.return_value, metadata)
+    archive.db.Delete.assert_called_once_with('zipballs',
+                                              where='md5 IN (?, ?)')
+    archive.db.query.assert_called_once_with('proper delete query',
+                                             'baz', 'qux')
+    assert result == len(metadata)
+
+
+@mock_cursor
+def test_add_meta_to_db_no_replacements(cursor, archive):
+    archive.add_meta_to_db([{'md5': 'foo'}], [])
+    assert not archive.db.Delete.called
+    assert not archive.db.query.called
+
+
+@mock.patch(MOD + '.MAX_VARIABLES', 2)
+@mock_cursor
+def test_add_meta_to_db_replacements_in_chunks(cursor, archive):
+    archive.db.Delete.return_value = 'proper delete query'
+    archive.add_meta_to_db([{'md5': 'foo'}], ['a', 'b', 'c'])
+    archive.db.query.assert_has_calls([
+        mock.call('proper delete query', 'a', 'b'),
+        mock.call('proper delete query', 'c'),
+    ])
+
+
 @mock_cursor
 def test_remove_meta_from_db(cursor, archive):
     hashes = ['foo', 'bar', 'baz']
@@ -53,12 +101,252 @@ def test_remove_meta_from_db(cursor, archive):
     assert result == len(hashes)
 
 
+@mock.patch(MOD + '.MAX_VARIABLES', 2)
+@mock_cursor
+def test_remove_meta_from_db_in_chunks(cursor, archive):
+    cursor.rowcount = 2
+    archive.db.Delete.return_value = 'proper delete query'
+    result = archive.remove_meta_from_db(['a', 'b', 'c'])
+    archive.db.query.assert_has_calls([
+        mock.call('proper delete query', 'a', 'b'),
+        mock.call('proper delete query', 'a', 'b'),
+        mock.call('proper delete query', 'c'),
+        mock.call('proper delete query', 'c'),
+    ])
+    assert result == 4
+
+
+@mock.patch(MOD + '.MAX_VARIABLES', 2)
+def test_get_titles_in_chunks(archive):
+    archive.db.Select.return_value = 'proper select query'
+    archive.db.results = [{'md5': 'a', 'title': 'foo'}]
+    result = archive.get_titles(['a', 'b', 'c'])
+    archive.db.query.assert_has_calls([
+        mock.call('proper select query', 'a', 'b'),
+        mock.call('proper select query', 'c'),
+    ])
+    assert result == [{'md5': 'a', 'title': 'foo'}] * 2
+
+
+@mock.patch.dict(MOD + '._pending_views', clear=True)
+def test_add_view_is_buffered(archive):
+    assert archive.add_view('foo') is True
+    assert archive.add_view('foo') is True
+    assert archive.add_view('bar') is True
+    assert not archive.db.query.called
+    assert not archive.db.executemany.called
+    assert mod._pending_views[archive.db] == {'foo': 2, 'bar': 1}
+
+
+@mock.patch.dict(MOD + '._pending_views', clear=True)
+@mock_cursor
+def test_flush_writes_buffered_views(cursor, archive):
+    archive.add_view('foo')
+    archive.add_view('foo')
+    archive.add_view('bar')
+    archive.flush()
+    q, params = archive.db.executemany.call_args[0]
+    assert q == mod.ADD_VIEWS_SQL
+    assert sorted(params) == [(1, 'bar'), (2, 'foo')]
+    assert archive.db not in mod._pending_views
+
+
+@mock.patch.dict(MOD + '._pending_views', clear=True)
+@mock_cursor
+def test_flush_failure_keeps_views(cursor, archive):
+    archive.add_view('foo')
+    archive.db.executemany.side_effect = RuntimeError()
+    with pytest.raises(RuntimeError):
+        archive.flush()
+    archive.add_view('foo')
+    assert mod._pending_views[archive.db] == {'foo': 2}
+
+
+@mock.patch.dict(MOD + '._pending_views', clear=True)
+def test_flush_with_no_views(archive):
+    archive.flush()
+    assert not archive.db.transaction.called
+
+
+@mock.patch.dict(MOD + '._pending_views', clear=True)
+@mock.patch.object(mod.EmbeddedArchive, 'flush')
+def test_add_view_flushes_when_buffer_is_full(flush, archive):
+    for i in range(mod.VIEWS_FLUSH_COUNT - 1):
+        archive.add_view(str(i))
+    assert not flush.called
+    archive.add_view('last')
+    flush.assert_called_once_with()
+
+
 def test_needs_formatting(archive):
     # FIXME: This needs to be an integration test for full cov
     archive.db.result.keep_formatting = True
     ret = archive.needs_formatting('foo')
-    assert archive.db.query.called
+    archive.db.query.assert_called_once_with(mod.NEEDS_FORMATTING_SQL, 'foo')
     assert ret is False
     archive.db.result.keep_formatting = False
     ret = archive.needs_formatting('foo')
     assert ret is True
+
+
+def test_get_single(archive):
+    ret = archive.get_single('foo')
+    archive.db.query.assert_called_once_with(mod.GET_SINGLE_SQL, 'foo')
+    assert ret == archive.db.result
+
+
+def test_content_for_domain(archive):
+    ret = archive.content_for_domain('WWW.Example.com:80')
+    archive.db.Select.assert_called_once_with(
+        sets='zipballs',
+        where='rhost = :rhost OR (rhost > :lower AND rhost < :upper)',
+        order=mod.CONTENT_ORDER,
+        limit=1)
+    archive.db.query.assert_called_once_with(archive.db.Select.return_value,
+                                             rhost='moc.elpmaxe',
+                                             lower='moc.elpmaxe.',
+                                             upper='moc.elpmaxe/')
+    assert ret == archive.db.result
+
+
+def test_content_for_domain_subdomains():
+    db = Database(Database.connect(':memory:'))
+    db.query('create table zipballs (md5, rhost, updated, views);')
+    hosts = ['example.com', 'news.example.com', 'a.b.example.com',
+             'notexample.com', 'example.community', 'example.org']
+    db.executemany('insert into zipballs values (?, ?, ?, 0);',
+                   [(host, host[::-1], '2015-01-0%s' % i)
+                    for i, host in enumerate(hosts, 1)])
+    archive = mod.EmbeddedArchive(db,
+                                  contentdir='unimportant',
+                                  spooldir='unimportant',
+                                  meta_filename='unimportant')
+    assert archive.content_for_domain('www.example.com')['md5'] == \
+        'a.b.example.com'
+    assert archive.content_for_domain('news.example.com')['md5'] == \
+        'news.example.com'
+    assert archive.content_for_domain('b.example.com')['md5'] == \
+        'a.b.example.com'
+    assert archive.content_for_domain('example.net') is None
+
+
+@mock.patch(MOD + '.MAX_VARIABLES', 2)
+@mock_cursor
+def test_add_tags_multirow_inserts(cursor, archive):
+    meta = mock.Mock(md5='foo', tags={})
+    archive.db.results = [{'name': 'a', 'tag_id': 1}]
+    archive.add_tags(meta, ['a', 'b', 'c'])
+    archive.db.query.assert_has_calls([
+        mock.call(mod.INSERT_TAGS_SQL % '(?), (?)', 'a', 'b'),
+        mock.call(mod.INSERT_TAGS_SQL % '(?)', 'c'),
+    ])
+    archive.db.query.assert_any_call(mod.INSERT_TAGGINGS_SQL % '(?, ?)',
+                                     1, 'foo')
+    assert meta.tags == {'a': 1}
+
+
+@mock.patch.dict(MOD + '._counts', clear=True)
+def test_get_count_cached(archive):
+    archive.db.Select = Database.Select
+    archive.db.result.count = 2
+    assert archive.get_count() == 2
+    archive.db.result.count = 3
+    assert archive.get_count() == 2
+    assert archive.get_count(lang='en') == 3
+    assert archive.db.query.call_count == 2
+
+
+@mock.patch.dict(MOD + '._counts', clear=True)
+@mock.patch(MOD + '.time')
+def test_get_count_search_expires(time, archive):
+    archive.db.Select = Database.Select
+    time.time.return_value = 100
+    archive.db.result.count = 2
+    assert archive.get_count(terms=u'foo') == 2
+    archive.db.result.count = 3
+    time.time.return_value = 100 + mod.SEARCH_COUNT_TTL - 1
+    assert archive.get_count(terms=u'foo') == 2
+    time.time.return_value = 100 + mod.SEARCH_COUNT_TTL
+    assert archive.get_count(terms=u'foo') == 3
+
+
+@mock.patch.dict(MOD + '._counts', clear=True)
+@mock.patch(MOD + '.COUNT_CACHE_SIZE', 1)
+def test_get_count_cache_size(archive):
+    archive.db.Select = Database.Select
+    archive.get_count(lang='en')
+    archive.get_count(lang='fr')
+    assert list(mod._counts[archive.db]) == [(None, None, 'fr', None)]
+
+
+@mock.patch.dict(MOD + '._counts', clear=True)
+@mock.patch(MOD + '.COUNT_CACHE_SIZE', 2)
+def test_get_count_evicts_least_recently_used(archive):
+    archive.db.Select = Database.Select
+    archive.get_count(lang='en')
+    archive.get_count(lang='fr')
+    archive.get_count(lang='en')
+    archive.get_count(lang='de')
+    assert list(mod._counts[archive.db]) == [(None, None, 'en', None),
+                                             (None, None, 'de', None)]
+
+
+@mock.patch.dict(MOD + '._counts', clear=True)
+@mock_cursor
+def test_get_count_cleared_on_write(cursor, archive):
+    cursor.rowcount = 1
+    archive.db.result.count = 2
+    archive.get_count()
+    archive.remove_meta_from_db(['foo'])
+    archive.db.result.count = 1
+    assert archive.get_count() == 1
+
+
+def test_get_content_fts_with_filters(archive):
+    archive.db.Select = Database.Select
+    archive.get_content(terms=u'foo bar', tag=1, lang='en', multipage=False)
+    (q,), params = archive.db.query.call_args
+    sql = str(q)
+    assert 'NATURAL JOIN taggings' in sql
+    assert 'JOIN zipballs_fts ON zipballs_fts.rowid = zipballs.rowid' in sql
+    assert ('WHERE tag_id = :tag_id AND language = :lang AND '
+            'multipage = :multipage AND zipballs_fts MATCH :terms') in sql
+    assert ('ORDER BY zipballs_fts.rank ASC, date(updated) DESC, '
+            'views DESC') in sql
+    assert params == {'terms': u'"foo"* "bar"*', 'tag_id': 1, 'lang': 'en',
+                      'multipage': False}
+
+
+def test_get_content_like_fallback_with_filters(archive):
+    archive.db.Select = Database.Select
+    archive.get_content(terms=u'C++', tag=1, lang='en', multipage=True)
+    (q,), params = archive.db.query.call_args
+    sql = str(q)
+    assert 'zipballs_fts' not in sql
+    assert ('WHERE tag_id = :tag_id AND language = :lang AND '
+            'multipage = :multipage AND title LIKE :terms') in sql
+    assert 'ORDER BY date(updated) DESC, views DESC' in sql
+    assert params == {'terms': u'%c++%', 'tag_id': 1, 'lang': 'en',
+                      'multipage': True}
+
+
+@mock.patch.dict(MOD + '._counts', clear=True)
+def test_get_count_whitespace_terms(archive):
+    archive.db.Select = Database.Select
+    archive.get_count(terms=u'  ', lang='en')
+    (q,), params = archive.db.query.call_args
+    assert str(q) == ('SELECT COUNT(*) as count FROM zipballs '
+                      'WHERE language = :lang;')
+    assert params['terms'] is None
+
+
+def test_fts_match():
+    assert mod.fts_match(u'foo') == u'"foo"*'
+    assert mod.fts_match(u' foo  bar ') == u'"foo"* "bar"*'
+    assert mod.fts_match(u'caf\xe9') == u'"caf\xe9"*'
+
+
+def test_fts_match_non_token_characters():
+    assert mod.fts_match(u'c++') is None
+    assert mod.fts_match(u'"foo') is None
+    assert mod.fts_match(u'foo_bar') is None
@@ -51,7 +51,7 @@ def attr_overrides(obj, **kwargs):
     orig_values = {}
     for key, value in kwargs.items():
         if not hasattr(obj, key):
-            new_attrs = key
+            new_attrs.append(key)
         else:
             orig_values[key] = getattr(obj, key)
         setattr(obj, key, value)
@@ -90,6 +90,19 @@ def test_is_required():
     assert mod.is_required('images') is False
 
 
+def test_get_host():
+    assert mod.get_host('http://example.com/foo') == 'example.com'
+    assert mod.get_host('HTTP://WWW.Example.com:8080/') == 'example.com'
+    assert mod.get_host('news.example.com/foo') == 'news.example.com'
+    assert mod.get_host('www.example.com') == 'example.com'
+    assert mod.get_host('') == ''
+
+
+def test_get_rhost():
+    assert mod.get_rhost('news.example.com') == 'moc.elpmaxe.swen'
+    assert mod.get_rhost('') == ''
+
+
 def test_replace_aliases():
     meta = {'url': 'test',
             'title': 'again',
@@ -271,11 +284,12 @@ def test_meta_class_init(json, os):
     data = mock.Mock()
     meta = mod.Meta(data, 'foo')
     assert meta.meta == data
-    data.get.assert_called_once_with('tags')
+    data.get.assert_any_call('tags')
     json.loads.assert_called_once_with(data.get.return_value)
     assert meta.tags == json.loads.return_value
     assert meta.cover_dir == 'foo'
     assert meta.zip_path is None
+    assert meta.lang == data.get.return_value
 
 
 @mock.patch(MOD + '.os', autospec=True)
@@ -338,6 +352,7 @@ def test_meta_get_key(*ignored):
     assert meta.get('missing') is None
 
 
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
 @mock.patch(MOD + '.json', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @with_mock_open
@@ -352,6 +367,7 @@ def test_meta_cache_cover_file_path(mock_open, os, *ignored):
     assert name == os.path.basename.return_value
 
 
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
 @mock.patch(MOD + '.json', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @with_mock_open
@@ -364,28 +380,39 @@ def test_meta_cache_cover_writes_image_data(mock_open, os, *ignored):
     fd.write.assert_called_once_with('fake image data')
 
 
+def test_image_re_matches_image_extensions():
+    for ext in mod.IMAGE_EXTENSIONS:
+        assert mod.IMAGE_RE.search('foo' + ext.upper()).group(0) == ext.upper()
+    assert mod.IMAGE_RE.search('foo.png.html') is None
+
+
+def mock_zip_entries(zipfile, *names):
+    """ Make mocked zip file list entries with specified names """
+    zipfile = zipfile.ZipFile.return_value.__enter__.return_value
+    zipfile.infolist.return_value = [mock.Mock(filename=n) for n in names]
+    return zipfile
+
+
 @mock.patch(MOD + '.json', autospec=True)
 @mock.patch(MOD + '.zipfile', autospec=True)
-@with_mock_open
-def test_extact_image_looks_for_frist_image(mock_open, zipfile, *ignored):
+def test_extact_image_looks_for_frist_image(zipfile_mod, *ignored):
     """ Extract image looks up the first image-looking in zip file """
-    zipfile = zipfile.ZipFile.return_value
-    zipfile.namelist.return_value = ['foo.txt', 'bar.jpg']
+    zipfile = mock_zip_entries(zipfile_mod, 'foo.txt', 'bar.JPG', 'baz.png')
     meta = mod.Meta({'md5': 'md5'}, 'covers_dir', zip_path='foo.zip')
     extension, content = meta.extract_image()
-    mock_open.assert_called_once_with('foo.zip', 'rb')
-    zipfile.open.assert_called_once_with('bar.jpg', 'r')
+    zipfile_mod.ZipFile.assert_called_once_with('foo.zip')
+    image_info = zipfile.infolist.return_value[1]
+    zipfile.open.assert_called_once_with(image_info)
     assert extension == '.jpg'
-    assert content == zipfile.open.return_value.read.return_value
+    fd = zipfile.open.return_value.__enter__.return_value
+    assert content == fd.read.return_value
 
 
 @mock.patch(MOD + '.json', autospec=True)
 @mock.patch(MOD + '.zipfile', autospec=True)
-@with_mock_open
-def test_extract_image_no_files(mock_open, zipfile, *ignored):
+def test_extract_image_no_files(zipfile_mod, *ignored):
     """ Extract image  returns None if there are no files in the zipball """
-    zipfile = zipfile.ZipFile.return_value
-    zipfile.namelist.return_value = []
+    zipfile = mock_zip_entries(zipfile_mod)
     meta = mod.Meta({'md5': 'md5'}, 'covers_dir', zip_path='foo.zip')
     extension, content = meta.extract_image()
     assert extension is None
@@ -395,42 +422,81 @@ def test_extract_image_no_files(mock_open, zipfile, *ignored):
 
 @mock.patch(MOD + '.json', autospec=True)
 @mock.patch(MOD + '.zipfile', autospec=True)
-@with_mock_open
-def test_extact_image_no_image(mock_open, zipfile, *ignored):
+def test_extact_image_no_image(zipfile_mod, *ignored):
     """ Extract image returns None if there are no images in the zipball """
-    print(zipfile)
-    zipfile = zipfile.ZipFile.return_value
-    zipfile.namelist.return_value = ['foo.html']
+    mock_zip_entries(zipfile_mod, 'foo.html')
     meta = mod.Meta({'md5': 'md5'}, 'covers_dir', zip_path='foo.zip')
     extension, content = meta.extract_image()
     assert extension is None
     assert content is None
 
 
-@mock.patch(MOD + '.os', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
-def test_get_cover_path_search_cover_dir(glob, os):
-    """ Get cover path searches cover dir for any file with md5 name """
-    os.path.normpath.side_effect = noop
-    glob.glob.side_effect = lambda x: ['found']
-    meta = mod.Meta({'md5': 'md5'}, 'covers_dir')
-    meta.get_cover_path()
-    os.path.join.assert_called_once_with('covers_dir', 'md5.*')
-    glob.glob.assert_called_once_with(os.path.join.return_value)
-    os.path.basename.assert_called_once_with('found')
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
+@mock.patch(MOD + '.os.path.exists')
+def test_find_cover_probes_extensions(exists):
+    """ Find cover checks for cover with each of the image extensions """
+    exists.side_effect = lambda p: p == 'covers_dir/md5.jpg'
+    assert mod.find_cover('covers_dir', 'md5') == 'md5.jpg'
+    exists.assert_has_calls([mock.call('covers_dir/md5.png'),
+                             mock.call('covers_dir/md5.gif'),
+                             mock.call('covers_dir/md5.jpg')])
 
 
-@mock.patch(MOD + '.os', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
-def test_get_cover_path_no_cover_found(glob, *ignored):
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
+@mock.patch(MOD + '.os.path.exists')
+def test_find_cover_is_cached(exists):
+    """ Once found, cover is returned without checking the cover dir """
+    exists.return_value = True
+    assert mod.find_cover('covers_dir', 'md5') == 'md5.png'
+    exists.reset_mock()
+    assert mod.find_cover('covers_dir', 'md5') == 'md5.png'
+    assert not exists.called
+
+
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
+@mock.patch(MOD + '.os.path.exists')
+def test_find_cover_no_cover_found(exists):
     """ None is returned and no exception raised when no cover is found """
-    glob.glob.return_value = []
+    exists.return_value = False
+    assert mod.find_cover('covers_dir', 'md5') is None
+    assert mod._cover_cache == {}
+
+
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
+@mock.patch(MOD + '.find_cover')
+def test_get_cover_path(find_cover):
+    """ Get cover path looks up the cover for content's md5 """
     meta = mod.Meta({'md5': 'md5'}, 'covers_dir')
-    try:
-        ret = meta.get_cover_path()
-        assert ret is None
-    except Exception:
-        assert False, 'Expected not to raise'
+    assert meta.get_cover_path() == find_cover.return_value
+    find_cover.assert_called_once_with('covers_dir', 'md5')
+
+
+@mock.patch.dict(MOD + '._cover_cache', clear=True)
+@mock.patch(MOD + '.os.path.exists')
+@with_mock_open
+def test_cache_cover_updates_cover_cache(mock_open, exists):
+    """ Caching the cover makes it available without checking cover dir """
+    meta = mod.Meta({'md5': 'md5'}, 'covers_dir')
+    meta.cache_cover('.gif', 'fake image data')
+    assert mod.find_cover('covers_dir', 'md5') == 'md5.gif'
+    assert not exists.called
+
+
+@mock.patch(MOD + '.json', autospec=True)
+@mock.patch(MOD + '.os', autospec=True)
+def test_hot_fields(*ignored):
+    """ Hot fields are stored as attributes and kept in sync with keys """
+    meta = mod.Meta({'md5': 'foo', 'title': 'bar'}, 'covers_dir')
+    assert not hasattr(meta, '__dict__')
+    assert meta.md5 == 'foo'
+    assert meta.title == 'bar'
+    meta['title'] = 'baz'
+    assert meta.title == 'baz'
+    del meta['title']
+    with pytest.raises(AttributeError):
+        meta.title
+    with pytest.raises(AttributeError):
+        meta.url
 
 
 @mock.patch(MOD + '.json', autospec=True)
@@ -460,6 +526,8 @@ def test_rtl_property(*ignored):
     assert meta.rtl is False
     meta['language'] = 'ar'
     assert meta.rtl is True
+    del meta['language']
+    assert meta.rtl is False
 
 
 @mock.patch(MOD + '.json', autospec=True)
@@ -526,7 +594,6 @@ def test_free_license_property(*ignored):
 
 
 @mock.patch(MOD + '.json', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @mock.patch.object(mod.Meta, 'get_cover_path')
 @mock.patch.object(mod.Meta, 'extract_image')
@@ -544,7 +611,6 @@ def test_image_property(cache_cover, extract_image, get_cover_path, *ignored):
 
 
 @mock.patch(MOD + '.json', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @mock.patch.object(mod.Meta, 'get_cover_path')
 @mock.patch.object(mod.Meta, 'extract_image')
@@ -558,7 +624,6 @@ def test_image_exists(cache_cover, extract_image, get_cover_path, *ignored):
 
 
 @mock.patch(MOD + '.json', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @mock.patch.object(mod.Meta, 'cache_cover')
 @mock.patch.object(mod.Meta, 'get_cover_path')
@@ -578,7 +643,6 @@ def test_extract_error(extract_image, get_cover_path, cache_cover, *ignored):
 
 
 @mock.patch(MOD + '.json', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @mock.patch.object(mod.Meta, 'extract_image')
 @mock.patch.object(mod.Meta, 'cache_cover')
@@ -593,7 +657,6 @@ def test_cache_error(get_cover_path, cache_cover, extract_image, *ignored):
 
 
 @mock.patch(MOD + '.json', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @mock.patch.object(mod.Meta, 'extract_image')
 @mock.patch.object(mod.Meta, 'cache_cover')
@@ -609,7 +672,6 @@ def test_cached_image(get_cover_path, cache_cover, extract_image, *ignored):
 
 
 @mock.patch(MOD + '.json', autospec=True)
-@mock.patch(MOD + '.glob', autospec=True)
 @mock.patch(MOD + '.os', autospec=True)
 @mock.patch.object(mod.Meta, 'extract_image')
 @mock.patch.object(mod.Meta, 'cache_cover')
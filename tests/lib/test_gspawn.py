@@ -1,5 +1,6 @@
 import mock
 
+import gevent
 import gevent.monkey
 gevent.monkey.patch_all(aggressive=True)
 
@@ -59,3 +60,25 @@ def test_with_timeout():
     except mod.TimeoutError:
         pass
 
+
+def test_every_calls_repeatedly():
+    """ Callable is called at each interval until the greenlet is killed """
+    fn = mock.Mock()
+    g = mod.every(0.01, fn, 'foo')
+    gevent.sleep(0.05)
+    g.kill()
+    count = fn.call_count
+    assert count >= 2
+    fn.assert_called_with('foo')
+    gevent.sleep(0.02)
+    assert fn.call_count == count
+
+
+def test_every_survives_exceptions():
+    """ Exceptions raised by the callable do not stop the loop """
+    fn = mock.Mock()
+    fn.side_effect = RuntimeError
+    g = mod.every(0.01, fn)
+    gevent.sleep(0.05)
+    g.kill()
+    assert fn.call_count >= 2
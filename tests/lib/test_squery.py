@@ -1,3 +1,5 @@
+import sqlite3 as stdlib_sqlite3
+
 import mock
 
 from librarian.lib import squery as mod
@@ -12,8 +14,14 @@ def test_connection_object_connects(sqlite3):
     sqlite3.connect.assert_called_once_with(
         'foo.db', detect_types=sqlite3.PARSE_DECLTYPES)
     assert conn._conn.isolation_level is None
-    conn._conn.cursor().execute.assert_called_once_with(
-        'PRAGMA journal_mode=WAL;')
+    conn._conn.cursor().execute.assert_has_calls([
+        mock.call('PRAGMA journal_mode=WAL;'),
+        mock.call('PRAGMA synchronous=NORMAL;'),
+        mock.call('PRAGMA cache_size=-20000;'),
+        mock.call('PRAGMA temp_store=MEMORY;'),
+        mock.call('PRAGMA mmap_size=268435456;'),
+        mock.call('PRAGMA optimize=0x10002;'),
+    ])
 
 
 @mock.patch(MOD + '.sqlite3', autospec=True)
@@ -44,6 +52,18 @@ def test_connection_close(sqlite3):
     conn = mod.Connection('foo.db')
     conn.close()
     assert sqlite3.connect().commit.called
+    sqlite3.connect().execute.assert_called_once_with('PRAGMA optimize;')
+    assert sqlite3.connect().close.called
+
+
+@mock.patch(MOD + '.sqlite3', autospec=True)
+def test_connection_close_optimize_fails(sqlite3):
+    """ Connection object closes even if optimizing fails """
+    sqlite3.OperationalError = stdlib_sqlite3.OperationalError
+    sqlite3.connect().execute.side_effect = stdlib_sqlite3.OperationalError(
+        'database is locked')
+    conn = mod.Connection('foo.db')
+    conn.close()
     assert sqlite3.connect().close.called
 
 
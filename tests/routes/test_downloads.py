@@ -0,0 +1,74 @@
+import gevent
+import mock
+
+import librarian.routes.downloads as mod
+
+
+MOD = mod.__name__
+
+
+@mock.patch.dict(MOD + '._metadata_cache', clear=True)
+@mock.patch(MOD + '.downloads')
+def test_get_metadata(downloads):
+    downloads.get_metadata.side_effect = lambda path, _: {'path': path}
+    result = mod.get_metadata([('foo.zip', 1), ('bar.zip', 2)], 'info.json')
+    assert result == [('foo.zip', 1, {'path': 'foo.zip'}, None),
+                      ('bar.zip', 2, {'path': 'bar.zip'}, None)]
+
+
+@mock.patch.dict(MOD + '._metadata_cache', clear=True)
+@mock.patch(MOD + '.downloads')
+def test_get_metadata_cached_by_timestamp(downloads):
+    downloads.get_metadata.return_value = {}
+    mod.get_metadata([('foo.zip', 1)], 'info.json')
+    mod.get_metadata([('foo.zip', 1)], 'info.json')
+    assert downloads.get_metadata.call_count == 1
+    mod.get_metadata([('foo.zip', 2)], 'info.json')
+    assert downloads.get_metadata.call_count == 2
+
+
+@mock.patch.dict(MOD + '._metadata_cache', clear=True)
+@mock.patch(MOD + '.downloads')
+def test_get_metadata_forgets_stale_entries(downloads):
+    downloads.get_metadata.return_value = {}
+    mod.get_metadata([('foo.zip', 1), ('bar.zip', 1)], 'info.json')
+    mod.get_metadata([('foo.zip', 2)], 'info.json')
+    assert list(mod._metadata_cache) == [('foo.zip', 2, 'info.json')]
+
+
+@mock.patch.dict(MOD + '._metadata_cache', clear=True)
+@mock.patch(MOD + '.downloads')
+def test_get_metadata_error(downloads):
+    from librarian.core.downloads import ContentError
+    err = ContentError('bad', 'foo.zip')
+    downloads.ContentError = ContentError
+    downloads.get_metadata.side_effect = err
+    result = mod.get_metadata([('foo.zip', 1)], 'info.json')
+    assert result == [('foo.zip', 1, None, err)]
+    assert mod._metadata_cache == {}
+
+
+class YieldingPool(object):
+    """ Thread pool stand-in that switches greenlets before mapping """
+
+    def map(self, func, iterable):
+        if iterable:
+            gevent.sleep(0)
+        return [func(i) for i in iterable]
+
+
+@mock.patch.dict(MOD + '._metadata_cache', clear=True)
+@mock.patch(MOD + '.metadata_pool', YieldingPool())
+@mock.patch(MOD + '.downloads')
+def test_get_metadata_concurrent_purge(downloads):
+    downloads.get_metadata.side_effect = lambda path, _: {'path': path}
+    mod.get_metadata([('foo.zip', 1), ('baz.zip', 1)], 'info.json')
+    # first call uses cached foo.zip and waits for bar.zip, while the second
+    # call lists only the cached baz.zip and purges foo.zip from the cache
+    first = gevent.spawn(mod.get_metadata, [('foo.zip', 1), ('bar.zip', 1)],
+                         'info.json')
+    second = gevent.spawn(mod.get_metadata, [('baz.zip', 1)], 'info.json')
+    gevent.joinall([first, second], raise_error=True)
+    assert first.value == [('foo.zip', 1, {'path': 'foo.zip'}, None),
+                           ('bar.zip', 1, {'path': 'bar.zip'}, None)]
+    assert second.value == [('baz.zip', 1, {'path': 'baz.zip'}, None)]
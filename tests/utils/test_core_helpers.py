@@ -0,0 +1,38 @@
+import mock
+
+import librarian.utils.core_helpers as mod
+
+
+MOD = mod.__name__
+
+
+def mock_request(request, db):
+    request.app.config = {'librarian.backend': 'backend',
+                          'content.contentdir': 'contentdir',
+                          'content.spooldir': 'spooldir',
+                          'content.metadata': 'metadata'}
+    request.db.main = db
+
+
+@mock.patch.dict(MOD + '._archives', clear=True)
+@mock.patch(MOD + '.Archive')
+@mock.patch(MOD + '.request')
+def test_open_archive_reuses_instance(request, Archive):
+    mock_request(request, 'db')
+    assert mod.open_archive() is mod.open_archive()
+    Archive.setup.assert_called_once_with('backend',
+                                          'db',
+                                          contentdir='contentdir',
+                                          spooldir='spooldir',
+                                          meta_filename='metadata')
+
+
+@mock.patch.dict(MOD + '._archives', clear=True)
+@mock.patch(MOD + '.Archive')
+@mock.patch(MOD + '.request')
+def test_open_archive_per_database(request, Archive):
+    mock_request(request, 'db')
+    mod.open_archive()
+    mock_request(request, 'other db')
+    mod.open_archive()
+    assert Archive.setup.call_count == 2
@@ -1,4 +1,7 @@
+import errno
+
 import mock
+import pytest
 
 import librarian.utils.setup as mod
 
@@ -34,44 +37,53 @@ def test_setup_data_access(load):
     assert setup.get('invalid', 1) == 1
 
 
-@mock.patch.object(mod.os.path, 'exists')
+@mock.patch('__builtin__.open')
 @mock.patch.object(mod.Setup, '__init__')
-def test_load_does_not_exist(init, exists):
-    exists.return_value = False
+def test_load_does_not_exist(init, f_open):
+    f_open.side_effect = IOError(errno.ENOENT, 'No such file or directory')
     init.return_value = None
     setup = mod.Setup()
     setup.setup_file = '/path/to/setup.json'
     assert setup.load() is None
-    exists.assert_called_once_with('/path/to/setup.json')
+    f_open.assert_called_once_with('/path/to/setup.json', 'rb')
 
 
-@mock.patch.object(mod.json, 'load')
 @mock.patch('__builtin__.open')
-@mock.patch.object(mod.os.path, 'exists')
 @mock.patch.object(mod.Setup, '__init__')
-def test_load_invalid_config(init, exists, f_open, json_load):
-    exists.return_value = True
+def test_load_not_readable(init, f_open):
+    f_open.side_effect = IOError(errno.EACCES, 'Permission denied')
     init.return_value = None
     setup = mod.Setup()
     setup.setup_file = '/path/to/setup.json'
+    with pytest.raises(IOError):
+        setup.load()
 
-    mocked_file = mock.Mock()
-    ctx_manager = mock.MagicMock()
-    ctx_manager.__enter__.return_value = mocked_file
-    f_open.return_value = ctx_manager
 
-    json_load.side_effect = ValueError()
+@mock.patch.object(mod, 'json_loads')
+@mock.patch('__builtin__.open')
+@mock.patch.object(mod.Setup, '__init__')
+def test_load_invalid_config(init, f_open, json_loads):
+    init.return_value = None
+    setup = mod.Setup()
+    setup.setup_file = '/path/to/setup.json'
+
+    mocked_file = mock.MagicMock()
+    f_open.return_value = mocked_file
+
+    json_loads.side_effect = ValueError()
 
     assert setup.load() is None
 
-    exists.assert_called_once_with('/path/to/setup.json')
-    json_load.assert_called_once_with(mocked_file)
+    f_open.assert_called_once_with('/path/to/setup.json', 'rb')
+    json_loads.assert_called_once_with(mocked_file.read.return_value)
+    assert mocked_file.__exit__.called
 
 
-@mock.patch.object(mod.json, 'dump')
+@mock.patch.object(mod, 'os')
+@mock.patch.object(mod, 'json_dumps')
 @mock.patch('__builtin__.open')
 @mock.patch.object(mod.Setup, '__init__')
-def test_save_config(init, f_open, json_dump):
+def test_save_config(init, f_open, json_dumps, os):
     init.return_value = None
     setup = mod.Setup()
     setup.setup_file = '/path/to/setup.json'
@@ -88,6 +100,108 @@ def test_save_config(init, f_open, json_dump):
                    'setup': 'result',
                    'another': 1,
                    'completed': True}
-    json_dump.assert_called_once_with(merged_data, mocked_file)
+    f_open.assert_called_once_with('/path/to/setup.json.tmp', 'wb')
+    json_dumps.assert_called_once_with(merged_data)
+    mocked_file.write.assert_called_once_with(json_dumps.return_value)
+    os.fsync.assert_called_once_with(mocked_file.fileno.return_value)
+    os.rename.assert_called_once_with('/path/to/setup.json.tmp',
+                                      '/path/to/setup.json')
 
     assert setup.is_completed is True
+
+
+@mock.patch.object(mod, 'os')
+@mock.patch.object(mod, 'json_dumps')
+@mock.patch('__builtin__.open')
+@mock.patch.object(mod.Setup, '__init__')
+def test_append_replaces_file_on_windows(init, f_open, json_dumps, os):
+    init.return_value = None
+    os.name = 'nt'
+    setup = mod.Setup()
+    setup.setup_file = '/path/to/setup.json'
+    setup.data = {}
+    f_open.return_value = mock.MagicMock()
+    setup.append({'foo': 'bar'})
+    os.unlink.assert_called_once_with('/path/to/setup.json')
+    os.rename.assert_called_once_with('/path/to/setup.json.tmp',
+                                      '/path/to/setup.json')
+
+
+@mock.patch.object(mod, 'os')
+@mock.patch.object(mod, 'json_dumps')
+@mock.patch('__builtin__.open')
+@mock.patch.object(mod.Setup, '__init__')
+def test_append_removes_temporary_file_on_error(init, f_open, json_dumps, os):
+    init.return_value = None
+    setup = mod.Setup()
+    setup.setup_file = '/path/to/setup.json'
+    setup.data = {}
+    f_open.return_value = mock.MagicMock()
+    os.fsync.side_effect = OSError(errno.EIO, 'I/O error')
+    with pytest.raises(OSError):
+        setup.append({'foo': 'bar'})
+    os.unlink.assert_called_once_with('/path/to/setup.json.tmp')
+    assert not os.rename.called
+
+
+def test_json_round_trip():
+    data = {'language': u'caf\xe9', 'completed': True}
+    assert mod.json_loads(mod.json_dumps(data)) == data
+    assert b' ' not in mod.json_dumps(data)
+
+
+@mock.patch.object(mod, 'redirect')
+@mock.patch.object(mod, 'request')
+def test_setup_plugin_completed(request, redirect):
+    request.app.setup.is_completed = True
+    callback = mock.Mock(__name__='callback')
+    wrapper = mod.setup_plugin('/en/setup/')(callback)
+    assert wrapper(1, foo=2) == callback.return_value
+    callback.assert_called_once_with(1, foo=2)
+    assert not redirect.called
+
+
+@mock.patch.object(mod, 'redirect')
+@mock.patch.object(mod, 'request')
+def test_setup_plugin_not_completed(request, redirect):
+    request.app.setup.is_completed = False
+    request.locale = 'en'
+    callback = mock.Mock(__name__='callback')
+    wrapper = mod.setup_plugin('/en/setup/')(callback)
+    request.path = '/content/'
+    assert wrapper() == redirect.return_value
+    redirect.assert_called_once_with('/en/setup/')
+    request.path = '/setup/'
+    assert wrapper() == callback.return_value
+
+
+@mock.patch.dict(mod.AUTO_CONFIGURATORS, clear=True)
+@mock.patch.object(mod.Setup, '__init__')
+def test_auto_configure(init):
+    init.return_value = None
+    mod.AUTO_CONFIGURATORS['foo'] = lambda: 1
+    mod.AUTO_CONFIGURATORS['bar'] = lambda: 2
+    setup = mod.Setup()
+    assert setup.auto_configure() == {'foo': 1, 'bar': 2}
+
+
+@mock.patch.dict(mod.AUTO_CONFIGURATORS, clear=True)
+@mock.patch.object(mod.Setup, '__init__')
+def test_auto_configure_error(init):
+    init.return_value = None
+
+    def configurator():
+        raise ValueError()
+
+    slow = mock.Mock(side_effect=lambda: mod.gevent.sleep(10))
+    mod.AUTO_CONFIGURATORS['foo'] = configurator
+    mod.AUTO_CONFIGURATORS['bar'] = slow
+    setup = mod.Setup()
+    real_killall = mod.gevent.killall
+    with mock.patch.object(mod.gevent, 'killall') as killall:
+        killall.side_effect = real_killall
+        with pytest.raises(ValueError):
+            setup.auto_configure()
+    greenlets = killall.call_args[0][0]
+    assert len(greenlets) == 2
+    assert all(g.dead for g in greenlets)